@@ -120,6 +120,29 @@ class TestBasicFSEntry(object):
             assert fse.type == "file"
             assert isinstance(fse.moddate, datetime)
 
+    def test_moddate_cached(self):
+        with tempfile.NamedTemporaryFile() as t:
+            fse = FileSystemEntry(path=t.name, modtime=1.0)
+        assert fse.moddate is fse.moddate
+        fse.modtime = 2.0
+        assert fse.moddate == datetime.fromtimestamp(2.0)
+
+    def test_moddate_subclass_without_base_init(self):
+        class Item(FilterItem):
+            def __init__(self, modtime):
+                self.modtime = modtime
+        i = Item(1.0)
+        assert i.moddate == datetime.fromtimestamp(1.0)
+
+    def test_statobj(self):
+        with tempfile.NamedTemporaryFile() as t:
+            st = os.lstat(t.name)
+        # The path does not exist anymore: `statobj` must be used.
+        fse = FileSystemEntry(path=t.name, statobj=st)
+        assert fse.type == "file"
+        assert fse.modtime == st.st_mtime
+        assert fse.stat_result is st
+
     def test_custom_modtime_wrongtype(self):
         with tempfile.NamedTemporaryFile() as t:
             with raises(TimegapsError):
@@ -138,6 +161,16 @@ class TestBasicFSEntry(object):
         assert fse.type == "symlink"
         assert isinstance(fse.moddate, datetime)
 
+    @mark.skipif("WINDOWS")
+    def test_unsupported_type(self):
+        fifoname = "/tmp/%s" % randstring_fssafe()
+        os.mkfifo(fifoname)
+        try:
+            with raises(TimegapsError):
+                FileSystemEntry(path=fifoname)
+        finally:
+            os.unlink(fifoname)
+
 
 class TestTimeFilterInit(object):
     """Test TimeFilter initialization logic.
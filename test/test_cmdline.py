@@ -252,6 +252,16 @@ class TestArgumentErrors(Base):
         t.assert_in_stderr(["Invalid", "token", "days"])
         t.assert_no_stdout()
 
+    def test_invalid_rulesstring_trailing_chars(self):
+        t = self.run("days1x nofile", rc=1)
+        t.assert_in_stderr(["Invalid", "token", "days1x"])
+        t.assert_no_stdout()
+
+    def test_invalid_rulesstring_uppercase(self):
+        t = self.run("Days1 nofile", rc=1)
+        t.assert_in_stderr(["Invalid", "token", "Days1"])
+        t.assert_no_stdout()
+
     def test_invalid_itempath_1(self):
         t = self.run("days5 nofile", rc=1)
         t.assert_in_stderr(["nofile", "Cannot access"])
@@ -295,6 +305,16 @@ class TestArgumentErrors(Base):
             "-r/--recursive-delete not allowed without -d/--delete")
         t.assert_no_stdout()
 
+    def test_jobs_zero(self):
+        t = self.run("-j 0 days1 .", rc=1)
+        t.assert_in_stderr("-j/--jobs must be a positive integer")
+        t.assert_no_stdout()
+
+    def test_invalid_itempath_jobs(self):
+        t = self.run("-j 2 days5 . nofile .", rc=1)
+        t.assert_in_stderr(["nofile", "Cannot access"])
+        t.assert_no_stdout()
+
 
 class TestSimpleFilterFeaturesCWD(Base):
     """Test minimal invocation signatures that filter files. The only file
@@ -340,6 +360,11 @@ class TestSimpleFilterFeaturesCWD(Base):
         t.assert_is_stdout(".\n.\n.\n.\n.\n.\n")
         t.assert_no_stderr()
 
+    def test_reject_cwd_years_multiple_times_jobs(self):
+        t = self.run("-j 2 years1 . . . . . .")
+        t.assert_is_stdout(".\n.\n.\n.\n.\n.\n")
+        t.assert_no_stderr()
+
     def test_cwd_recent_multiple_times(self):
         # Accept 10 recent, print accepted, provide 5 recent -> print 5
         t = self.run("-a recent10 . . . . .")
@@ -490,6 +515,16 @@ class TestStringInterpretationMode(Base):
             "--time-from-string %s days1 20000000-111213" % self.fmt, rc=1)
         t.assert_in_stderr(["ERROR", "20000000", "does not match format"])
 
+    def test_onearg_fmterror_invalid_day(self):
+        t = self.run(
+            "--time-from-string %s days1 20000230-111213" % self.fmt, rc=1)
+        t.assert_in_stderr(["ERROR", "day is out of range for month"])
+
+    def test_onearg_fmt_other_directive(self):
+        t = self.run("--time-from-string %Y%j days1 2000317")
+        t.assert_is_stdout("2000317\n")
+        t.assert_no_stderr()
+
     def test_multi_item_stdin(self):
         items = ["20001112-111213", "20001112-111214","20001112-111215"]
         s = "\n".join(items).encode(STDINENC)
@@ -503,6 +538,17 @@ class TestStringInterpretationMode(Base):
         t.assert_no_stderr()
 
 
+    def test_multi_item_stdin_exceeding_read_blocksize(self):
+        # Stdin is read in blocks of 1 MiB. Make sure that items are not
+        # corrupted at block boundaries.
+        items = ["20001112-1112%02d" % (i % 60) for i in range(70000)]
+        s = "\n".join(items).encode(STDINENC)
+        assert len(s) > 1024 * 1024
+        t = self.run("--stdin --time-from-string %s days1" % self.fmt, sin=s)
+        t.assert_is_stdout(s + b"\n")
+        t.assert_no_stderr()
+
+
 class TestReferenceTime(Base):
     """Test -t/--reference-time parsing and logic."""
 
@@ -614,6 +660,18 @@ class TestFileFilter(Base):
         t.assert_no_stderr()
 
 
+    def test_jobs_output_order(self):
+        # Concurrent file system entry creation must not change the order of
+        # items.
+        now = time.time()
+        names = ["f%s" % i for i in range(1, 21)]
+        for name in names:
+            self.mfile(name, now - 60*60*24*365*2)
+        t = self.run("-j 4 years1 %s" % " ".join(names))
+        t.assert_is_stdout("".join("%s\n" % n for n in names))
+        t.assert_no_stderr()
+
+
 class TestPeriodicRun(Base):
     """Tests for the scenario where timegaps is run periodically, in
     conjunction with backup/snapshot creation.
@@ -810,6 +868,33 @@ class TestFileFilterActions(Base):
         t.assert_paths_not_exist(r_paths)
         t.assert_paths_exist(a_paths)
 
+    def test_jobs_delete_files(self):
+        now = time.time()
+        names = ["f%s" % i for i in range(1, 21)]
+        for name in names:
+            self.mfile(name, now - 60*60*24*365*2)
+        t = self.run("-j 4 --delete years1 %s" % " ".join(names))
+        t.assert_is_stdout("".join("%s\n" % n for n in names))
+        t.assert_no_stderr()
+        t.assert_paths_not_exist(names)
+
+    def test_jobs_delete_stops_on_error(self):
+        # Deleting symlinks is not supported. Once this raises, no further
+        # deletions must be started. The number of deletions already in
+        # flight at that point depends on timing, so only require that not
+        # all files have been deleted.
+        now = time.time()
+        self.mfile("f0", now - 60*60*24*365*2)
+        os.symlink("f0", os.path.join(self.rundir, "a_link"))
+        names = ["f%s" % i for i in range(1, 21)]
+        for name in names:
+            self.mfile(name, now - 60*60*24*365*2)
+        t = self.run("-j 2 --delete days1 a_link %s" % " ".join(names), rc=1)
+        t.assert_in_stderr("NotImplementedError")
+        remaining = [n for n in names
+            if os.path.exists(os.path.join(self.rundir, n))]
+        assert remaining
+
     def test_delete_notempty(self):
         d = "testdir"
         f = "testfile"
@@ -833,6 +918,34 @@ class TestFileFilterActions(Base):
         t.assert_no_stderr()
         t.assert_paths_not_exist(d)
 
+    def test_move_target_exists(self):
+        now = time.time()
+        self.mfile("test", now)
+        self.mdir("movehere")
+        self.mfile(os.path.join("movehere", "test"), now)
+        t = self.run("--move movehere days1 test")
+        t.assert_in_stdout("test")
+        t.assert_in_stderr(["ERROR", "Cannot move", "already exists"])
+        t.assert_paths_exist("test")
+
+    def test_jobs_move_same_basename(self):
+        # Items with the same basename must not overwrite each other in the
+        # target directory, also when using multiple threads.
+        now = time.time()
+        self.mdir("movehere")
+        dirs = ["d%s" % i for i in range(1, 21)]
+        for d in dirs:
+            self.mdir(d, now)
+            self.mfile(os.path.join(d, "f"), now - 60*60*24*2)
+        itemargs = " ".join(os.path.join(d, "f") for d in dirs)
+        t = self.run("-j 8 --move movehere days1 %s" % itemargs)
+        t.assert_in_stderr(["ERROR", "Cannot move", "already exists"])
+        t.assert_paths_exist(os.path.join("movehere", "f"))
+        # Exactly one item has been moved, the others are still in place.
+        remaining = [d for d in dirs
+            if os.path.exists(os.path.join(self.rundir, d, "f"))]
+        assert len(remaining) == len(dirs) - 1
+
 
 class TestMisc(Base):
     """Tests that do not fit in other categories.
@@ -7,9 +7,6 @@
 """Accept or reject items based on age categorization."""
 
 
-from __future__ import unicode_literals
-
-
 __version__ = '0.1.1'
 EXTENDED_HELP = """
 Timegaps accepts or rejects file system paths (items) based their modification
@@ -148,28 +145,23 @@ Exit status:
 
 
 import os
+import re
+import errno
 import sys
-import shutil
 import argparse
 import logging
-import re
 import time
+from datetime import datetime
+from string import ascii_lowercase, digits
+from itertools import chain, repeat
+from operator import attrgetter
 from .timegaps import FileSystemEntry, FilterItem
 from .timefilter import TimeFilter, TimeFilterError
 
 
-# Make the same code base run with Python 2 and 3.
-if sys.version < '3':
-    text_type = unicode
-    binary_type = str
-    stdout_write_bytes = sys.stdout.write
-    stdin_read_bytes_until_eof = sys.stdin.read
-else:
-    text_type = str
-    binary_type = bytes
-    # http://docs.python.org/3/library/sys.html#sys.stdout
-    stdout_write_bytes = sys.stdout.buffer.write
-    stdin_read_bytes_until_eof = sys.stdin.buffer.read
+# http://docs.python.org/3/library/sys.html#sys.stdout
+stdout_write_bytes = sys.stdout.buffer.write
+stdin_read_bytes = sys.stdin.buffer.read
 
 
 WINDOWS = sys.platform == "win32"
@@ -177,14 +169,9 @@ if WINDOWS:
     import msvcrt
 
 
-log = logging.getLogger()
-log.setLevel(logging.ERROR)
-ch = logging.StreamHandler()
-formatter = logging.Formatter(
-    '%(asctime)s,%(msecs)-6.1f - %(levelname)s: %(message)s',
-    datefmt='%H:%M:%S')
-ch.setFormatter(formatter)
-log.addHandler(ch)
+# Log handler and format are set up in `setup_logging()`, i.e. only when the
+# program is run, not when this module is imported.
+log = logging.getLogger(__name__)
 
 
 # http://cygwin.com/cygwin-ug-net/using-textbinary.html
@@ -211,24 +198,26 @@ if WINDOWS:
         # ValueError: redirected Stdin is pseudofile, has no fileno()
         # is possible. Seen when py.test imports the package.
         try:
-            if sys.version < '3':
-                msvcrt.setmode(stream.fileno(), os.O_BINARY)
-            else:
-                msvcrt.setmode(stream.buffer.fileno(), os.O_BINARY)
+            msvcrt.setmode(stream.buffer.fileno(), os.O_BINARY)
         except ValueError as e:
             log.error("Could not set mode to O_BINARY on %s: %s", stream, e)
 
 
 # To be populated by argparse from cmdline arguments.
 options = None
+# Codec for encoding stdout data and for decoding stdin data, as well as the
+# item separator encoded with this codec. Invariant for a run. Set in main().
+outenc = None
+sep_bytes = None
 
 
 def main():
+    rootlog = setup_logging()
     parse_options()
     if options.verbose == 1:
-        log.setLevel(logging.INFO)
+        rootlog.setLevel(logging.INFO)
     elif options.verbose == 2:
-        log.setLevel(logging.DEBUG)
+        rootlog.setLevel(logging.DEBUG)
 
     # Be explicit about input and output encoding, at least when connected via
     # pipes. Also see http://stackoverflow.com/a/4374457/145400
@@ -245,6 +234,10 @@ def main():
             err("%s %s" % (errmsg, stdinnote))
         err(errmsg)
 
+    global outenc, sep_bytes
+    outenc = sys.stdout.encoding
+    sep_bytes = ("\0" if options.nullsep else "\n").encode(outenc)
+
     log.debug("Options namespace:\n%s", options)
 
 
@@ -253,28 +246,22 @@ def main():
     # argparse does not catch when the user misses to provide RULES or (one)
     # ITEM (0 ITEMs is allowed when --stdin is set). Validate RULES and
     # ITEMs here in the order as consumed by argparse (first RULES, then ITEMS).
-    rules_unicode = options.rules
-    if not isinstance(rules_unicode, text_type):
-        # Python 3 should always create unicode/text type arguments (which is
-        # implicit magic, at least on Unix, but a quite well-behaving magic
-        # due to the use of surrogate de(en)coding). Python 2 argv is populated
-        # with byte strings, in which case we want to manually decode the RULES
-        # string before parsing it. sys.stdout.encoding is either derived from
-        # LC_CTYPE (set on the typical Unix system) or from environment
-        # variable PYTHONIOENCODING, which is good for overriding and making
-        # guarantees.
-        rules_unicode = options.rules.decode(sys.stdout.encoding)
+    # Python 3 populates argv with str objects (which is implicit magic, at
+    # least on Unix, but a quite well-behaving magic due to the use of
+    # surrogate de(en)coding).
     log.debug("Decode rules string.")
     try:
-        rules = parse_rules_from_cmdline(rules_unicode)
+        rules = parse_rules_from_cmdline(options.rules)
     except ValueError as e:
         err("Error while parsing rules: '%s'." % e)
     log.info("Using rules: %s", rules)
+    # Test for emptiness via truth value, which does not require `items` to
+    # be a sized sequence.
     if not options.stdin:
-        if len(options.items) == 0:
+        if not options.items:
             err("At least one ITEM must be provided (-s/--stdin not set).")
     else:
-        if len(options.items) > 0:
+        if options.items:
             err("No ITEM must be provided on command line (-s/--stdin is set).")
 
     # Determine reference time and create `TimeFilter` instance. Do this as
@@ -293,9 +280,13 @@ def main():
     except TimeFilterError as e:
         err("Error upon time filter setup: %s" % e)
 
+    # Device of the --move target directory, for choosing between a rename()
+    # and a copy-and-delete move in `action_func()`.
+    move_dev = None
     if options.move is not None:
         if not os.path.isdir(options.move):
             err("--move target not a directory: '%s'" % options.move)
+        move_dev = os.stat(options.move).st_dev
 
     # Pure string interpretation mode is currently not compatible with any type
     # of file system interaction. Forbid.
@@ -308,6 +299,9 @@ def main():
         if not options.delete:
             err("-r/--recursive-delete not allowed without -d/--delete.")
 
+    if options.jobs < 1:
+        err("-j/--jobs must be a positive integer.")
+
 
     # STAGE II: collect and validate items.
 
@@ -323,11 +317,18 @@ def main():
         accepted, rejected = timefilter.filter(items)
     except TimeFilterError as e:
         err("Error while filtering items: %s" % e)
-    rejected = list(rejected)
+    # `rejected` is an iterable that is consumed only once below. Derive the
+    # number of rejected items instead of materializing all of them.
     log.info("Number of accepted items: %s", len(accepted))
-    log.info("Number of rejected items: %s", len(rejected))
-    log.debug("Accepted item(s):\n%s", "\n".join("%s" % a for a in accepted))
-    log.debug("Rejected item(s):\n%s", "\n".join("%s" % r for r in rejected))
+    log.info("Number of rejected items: %s", len(items) - len(accepted))
+    # Building these strings is expensive for many items, even if the log
+    # messages are discarded. Only do it when required.
+    if log.isEnabledFor(logging.DEBUG):
+        rejected = list(rejected)
+        log.debug("Accepted item(s):\n%s",
+            "\n".join("%s" % a for a in accepted))
+        log.debug("Rejected item(s):\n%s",
+            "\n".join("%s" % r for r in rejected))
 
 
     # STAGE IV: item action and item output.
@@ -338,74 +339,197 @@ def main():
     #       - perform file system action on item, if specified
 
     # Write binary data to stdout. If available, use original binary data as
-    # provided via input ("pass-through" mode, useful e.g. for paths on Unix,
-    # easily done with Python 2) or encode unicode to output encoding, which
-    # should re-create the original data as provided via input (Python 3 uses
-    # surrogates when parsing argv to unicode objects).
+    # provided via input ("pass-through" mode, useful e.g. for paths on Unix)
+    # or encode unicode to output encoding, which should re-create the original
+    # data as provided via input (Python 3 uses surrogates when parsing argv to
+    # unicode objects).
     # If automatically chosen, sys.stdout.encoding might not always be the right
     # thing. However, via PYTHONIOENCODING sys.stdout.encoding can be explicitly
     # set by the user, which is ideal behavior.
-    outenc = sys.stdout.encoding
-    sep = "\0" if options.nullsep else "\n"
-    sep_bytes = sep.encode(outenc)
-    actionitems = rejected if not options.accepted else accepted
+    actionitems = iter(rejected if not options.accepted else accepted)
+    try:
+        first = next(actionitems)
+    except StopIteration:
+        return
+    # All items are of the same type, and all paths are of the same string
+    # type. Choose the conversion to bytes once instead of once per item.
+    to_bytes = item_to_bytes_func(first, outenc)
+    actionitems = chain((first,), actionitems)
+    write = stdout_write_bytes
+    if not (options.delete or options.move):
+        # No action requested: accumulate the output of 4096 items in a buffer
+        # and write it with a single call instead of calling write() once per
+        # item. Unlike joining all output, this bounds the memory required.
+        buf = bytearray()
+        for idx, ai in enumerate(actionitems, 1):
+            buf += to_bytes(ai)
+            buf += sep_bytes
+            if not idx % 4096:
+                write(buf)
+                del buf[:]
+        write(buf)
+        return
+    action = action_func(options, move_dev)
+    # Moving is not performed concurrently: whether the destination path is
+    # free is checked before renaming, and concurrent moves of items with the
+    # same basename could overwrite each other.
+    if options.jobs > 1 and not options.move:
+        perform_actions_concurrently(
+            actionitems, to_bytes, action, options.jobs)
+        return
     for ai in actionitems:
-        # If `ai` is of `FileSystemEntry` type, then `path` attribute can be
-        # unicode or bytes. If bytes, then write them as they are. If unicode,
-        # encode with `outenc`.
-        if isinstance(ai, FileSystemEntry):
-            itemstring_bytes = ai.path
-            if isinstance(ai.path, text_type):
-                itemstring_bytes = ai.path.encode(outenc)
-        else:
-            # `ai` is of type FilterItem: `text` attribute always is unicode.
-            itemstring_bytes = ai.text.encode(outenc)
-        # __add__ of two byte strings returns byte string with both, Py 2 and 3.
-        stdout_write_bytes(itemstring_bytes + sep_bytes)
+        # Two writes into the buffered stdout stream instead of concatenating
+        # both byte strings, which would create a temporary object per item.
+        write(to_bytes(ai))
+        write(sep_bytes)
         action(ai)
 
 
-def action(item):
-    """Perform none or one action on item.
+def perform_actions_concurrently(actionitems, to_bytes, action, nthreads):
+    """Write action items to stdout (in order) and perform the action on each
+    item, using a pool of `nthreads` threads.
+
+    Deleting involves blocking system calls that release the GIL, i.e.
+    multiple actions can be in flight at the same time. Actions may complete
+    in any order. Error messages emitted by `action` contain the path of the
+    item, so they remain meaningful.
 
-    Currently, this implements file system actions (delete and move).
+    At most `nthreads` actions are in flight. If an action raises an
+    exception, no further actions are started, and the exception is re-raised
+    after the actions in flight have completed.
     """
-    if not isinstance(item, FileSystemEntry):
-        return
-    if options.move:
-        tdir = options.move
-        log.info("Moving %s to directory %s: %s", item.type, tdir, item.path)
-        try:
-            shutil.move(item.path, tdir)
-        except OSError as e:
-            log.error("Cannot move '%s': %s", item.path, e)
-        return
-    if options.delete:
-        log.info("Deleting %s: %s", item.type, item.path)
-        if item.type == "dir":
-            if options.recursive_delete:
-                # shutil.rmtree: Delete an entire directory tree; path must
-                # point to a directory (but not a symbolic link to a directory).
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    log.info("Perform actions using %s threads.", nthreads)
+    write = stdout_write_bytes
+    with ThreadPoolExecutor(nthreads) as executor:
+        inflight = set()
+        for ai in actionitems:
+            # Collect completed actions. If all threads are busy, wait for
+            # (at least) one action to complete.
+            done, inflight = wait(inflight,
+                timeout=None if len(inflight) >= nthreads else 0,
+                return_when=FIRST_COMPLETED)
+            for f in done:
+                # Re-raise unexpected exceptions before submitting more.
+                f.result()
+            write(to_bytes(ai))
+            write(sep_bytes)
+            inflight.add(executor.submit(action, ai))
+        for f in inflight:
+            f.result()
+
+
+def item_to_bytes_func(item, enc):
+    """Return function that converts items of the same kind as `item` to their
+    byte string representation for writing to stdout.
+    """
+    # If the item has been created from a byte string (read from stdin), then
+    # return that byte string: it equals the encoded representation. `raw`
+    # is unset for subclasses not calling FilterItem.__init__().
+    if getattr(item, "raw", None) is not None:
+        return attrgetter("raw")
+    # If `item` is of `FileSystemEntry` type, then `path` attribute can be
+    # unicode or bytes. If bytes, then return them as they are. If unicode,
+    # encode with `enc`.
+    if isinstance(item, FileSystemEntry):
+        if isinstance(item.path, str):
+            return lambda i: i.path.encode(enc)
+        return attrgetter("path")
+    # `item` is of type FilterItem: `text` attribute always is unicode.
+    return lambda i: i.text.encode(enc)
+
+
+def setup_logging():
+    """Attach stderr handler to the root logger, so that log messages of all
+    timegaps modules are emitted. Set default log level. Return root logger.
+    """
+    rootlog = logging.getLogger()
+    rootlog.setLevel(logging.ERROR)
+    if not rootlog.handlers:
+        ch = logging.StreamHandler()
+        formatter = logging.Formatter(
+            '%(asctime)s,%(msecs)-6.1f - %(levelname)s: %(message)s',
+            datefmt='%H:%M:%S')
+        ch.setFormatter(formatter)
+        rootlog.addHandler(ch)
+    return rootlog
+
+
+def action_func(opts, move_dev=None):
+    """Return function that performs none or one action on an item, as
+    specified by the options namespace `opts`. `move_dev` is the device of
+    the move target directory (if any).
+
+    Currently, this implements file system actions (delete and move). The
+    relevant options are bound to local variables of the returned function
+    once, instead of looking them up for each item.
+    """
+    tdir = opts.move
+    delete = opts.delete
+    recursive_delete = opts.recursive_delete
+
+    def action(item):
+        if not isinstance(item, FileSystemEntry):
+            return
+        if tdir:
+            log.info("Moving %s to directory %s: %s",
+                item.type, tdir, item.path)
+            if item.stat_result.st_dev == move_dev:
+                # Same device: a rename() is sufficient. Unlike shutil.move(),
+                # this does not need to stat() the target directory per item.
+                dst = os.path.join(
+                    tdir, os.path.basename(item.path.rstrip(os.sep)))
+                # Like shutil.move(), do not overwrite an existing entry.
+                if os.path.lexists(dst):
+                    log.error("Cannot move '%s': Destination path '%s' "
+                        "already exists", item.path, dst)
+                    return
                 try:
-                    shutil.rmtree(item.path)
+                    os.rename(item.path, dst)
+                    return
                 except OSError as e:
-                    log.error("Error while recursively deleting '%s': %s",
-                        item.path, e)
-                return
+                    # EXDEV: e.g. different mount points of the same file
+                    # system. Let shutil.move() copy and delete.
+                    if e.errno != errno.EXDEV:
+                        log.error("Cannot move '%s': %s", item.path, e)
+                        return
+            # Import here, not at module level: only required for actions, and
+            # importing shutil takes a noticeable fraction of the startup time.
+            import shutil
             try:
-                # Raises OSError if dir not empty.
-                os.rmdir(item.path)
+                shutil.move(item.path, tdir)
             except OSError as e:
-                log.error("Cannot rmdir '%s': %s", item.path, e)
+                log.error("Cannot move '%s': %s", item.path, e)
             return
-        elif item.type == "file":
-            try:
-                os.remove(item.path)
-            except OSError as e:
-                log.error("Cannot delete file '%s': %s", item.path, e)
-            return
-        else:
-            raise NotImplementedError
+        if delete:
+            log.info("Deleting %s: %s", item.type, item.path)
+            if item.type == "dir":
+                if recursive_delete:
+                    # shutil.rmtree: Delete an entire directory tree; path
+                    # must point to a directory (but not a symbolic link to a
+                    # directory).
+                    import shutil
+                    try:
+                        shutil.rmtree(item.path)
+                    except OSError as e:
+                        log.error("Error while recursively deleting '%s': %s",
+                            item.path, e)
+                    return
+                try:
+                    # Raises OSError if dir not empty.
+                    os.rmdir(item.path)
+                except OSError as e:
+                    log.error("Cannot rmdir '%s': %s", item.path, e)
+                return
+            elif item.type == "file":
+                try:
+                    os.remove(item.path)
+                except OSError as e:
+                    log.error("Cannot delete file '%s': %s", item.path, e)
+                return
+            else:
+                raise NotImplementedError
+    return action
 
 
 def read_items_from_stdin():
@@ -414,79 +538,106 @@ def read_items_from_stdin():
     Regarding stdin decoding: http://stackoverflow.com/a/16549381/145400
     Reading a stream of chunks/records with a different separator than newline
     is not easily possible with stdlib (http://bugs.python.org/issue1152248).
-    Take simplest approach for now: read all data (processing cannot start
-    before that anyway), then split data (byte string) at sep byte occurrences
-    (NUL or newline), then decode each record and return list of unicode
-    strings.
+    Read binary data in blocks of 1 MiB until EOF. Split each block at sep
+    byte occurrences (NUL or newline). Collect the pieces of a record spanning
+    multiple blocks in a list, and join them once its end has been found. This
+    way, no buffer holding the entire stdin data is required (the records
+    themselves are all kept in memory). Return list of non-empty byte strings,
+    to be decoded by the caller.
     """
-    log.debug("Read binary data from standard input, until EOF.")
-    try:
-        bytedata = stdin_read_bytes_until_eof()
-    except (OSError, IOError) as e:
-        err("Error reading from stdin: %s" % e)
-    log.debug("%s bytes have been read.", len(bytedata))
-
-    enc = sys.stdout.encoding
-    sep = "\0" if options.nullsep else "\n"
-    sep_bytes = sep.encode(enc)
-    log.debug("Split binary stdin data on byte separator %r.", sep_bytes)
-    chunks = bytedata.split(sep_bytes)
-    log.debug("Decode non-empty chunks using %s.", enc)
-    # `split()` is the inverse of `join()`, i.e. it introduces empty strings for
-    # leading and trailing separators, and for separator sequences. That is why
-    # the `if c` part below is essential. Also see
-    # http://stackoverflow.com/a/2197493/145400
-    items_unicode = [c.decode(enc) for c in chunks if c]
-    log.debug("Identified %s item(s).", len(items_unicode))
-    return items_unicode
+    log.debug("Read binary data from standard input, until EOF. Split on byte "
+        "separator %r.", sep_bytes)
+    items_bytes = []
+    # Pieces of the (so far) incomplete record at the end of the last block.
+    pending = []
+    nbytes = 0
+    while True:
+        try:
+            block = stdin_read_bytes(1048576)
+        except (OSError, IOError) as e:
+            err("Error reading from stdin: %s" % e)
+        if not block:
+            break
+        nbytes += len(block)
+        chunks = block.split(sep_bytes)
+        if len(chunks) == 1:
+            # No separator in this block: the pending record continues.
+            pending.append(block)
+            continue
+        # The first chunk completes the pending record (if any).
+        if pending:
+            pending.append(chunks[0])
+            chunks[0] = b"".join(pending)
+        # The last chunk might be incomplete. Process it with the next block.
+        pending = [chunks.pop()]
+        # `split()` is the inverse of `join()`, i.e. it introduces empty strings
+        # for leading and trailing separators, and for separator sequences.
+        # That is why the `if c` part below is essential. Also see
+        # http://stackoverflow.com/a/2197493/145400
+        items_bytes.extend(c for c in chunks if c)
+    last = b"".join(pending)
+    if last:
+        items_bytes.append(last)
+    log.debug("%s bytes have been read.", nbytes)
+    log.debug("Identified %s item(s).", len(items_bytes))
+    return items_bytes
 
 
 def prepare_input():
     """Return a list of objects that can be categorized by `TimeFilter.filter`.
     """
     if not options.stdin:
+        # Python 3 populates argv with str objects. Paths that cannot be
+        # decoded are represented using surrogate escapes, and re-created
+        # upon encoding.
         itemstrings = options.items
-        # `itemstrings` can be either unicode or byte strings. On Unix, we
-        # want to keep cmdline arguments as raw binary data as long as possible.
-        # On Python 3 argv already comes in as sequence of unicode strings.
-        # In file system mode on Python 2, treat items (i.e. paths) as byte
-        # strings. In time-from-string mode, decode itemstrings (later).
         if options.glob:
             if WINDOWS:
                 import glob
-                expandeditems = []
-                for pattern in itemstrings:
-                    expandeditems.extend(glob.glob(pattern))
-                itemstrings = expandeditems
+                # Expand lazily: each pattern's matches are consumed while
+                # building items, no intermediate list of all paths is built.
+                itemstrings = chain.from_iterable(
+                    glob.iglob(pattern) for pattern in itemstrings)
             else:
                 log.info("Item wildcard expansion only allowed on Windows.")
+        # There is no binary representation of items to keep.
+        rawitems = repeat(None)
     else:
-        itemstrings = read_items_from_stdin()
-        # `itemstrings` as returned by `read_items_from_stdin()` are unicode.
-
+        # Keep the original byte strings next to the decoded item strings.
+        # When writing items to stdout, the byte strings can be written as
+        # they are instead of encoding each item again.
+        rawitems = read_items_from_stdin()
+        itemstrings = [r.decode(outenc) for r in rawitems]
+
+    # `itemstrings` is consumed exactly once below, item objects are created
+    # on the fly. It is not required to be a sequence.
+    # Check once (instead of within each log call, N times) whether per-item
+    # debug messages are to be emitted at all.
+    debug = log.isEnabledFor(logging.DEBUG)
     if options.time_from_string is not None:
         log.info("--time-from-string set, don't interpret items as paths.")
         fmt = options.time_from_string
-        # Decoding of each single item string.
-        # If items came from stdin, they are already unicode. If they came from
-        # argv and Python 2 on Unix, they are still byte strings.
-        if isinstance(itemstrings[0], binary_type):
-            # Again, use sys.stdout.encoding to decode item byte strings, which
-            # can be set/overridden via PYTHONIOENCODING.
-            itemstrings = [s.decode(sys.stdout.encoding) for s in itemstrings]
         items = []
-        for s in itemstrings:
-            log.debug("Parsing seconds since epoch from item: %r", s)
+        for s, raw in zip(itemstrings, rawitems):
+            if debug:
+                log.debug("Parsing seconds since epoch from item: %r", s)
             mtime = seconds_since_epoch_from_localtime_string(s, fmt)
-            log.debug("Seconds since epoch: %s", mtime)
-            items.append(FilterItem(modtime=mtime, text=s))
+            if debug:
+                log.debug("Seconds since epoch: %s", mtime)
+            items.append(FilterItem(modtime=mtime, text=s, raw=raw))
         return items
 
     log.info("Interpret items as paths.")
     log.info("Validate paths and extract modification time.")
     fses = []
-    for path in itemstrings:
-        log.debug("Type of path string: %s.", type(path))
+    pathmodtimes = []
+    # Duplicate items are treated independently. However, stat() each path
+    # only once: path -> stat result of the first occurrence.
+    statobjs = {}
+    basename_fmt = options.time_from_basename
+    for path, raw in zip(itemstrings, rawitems):
+        if debug:
+            log.debug("Type of path string: %s.", type(path))
         # On the one hand, a unicode-aware Python program should only use
         # unicode type strings internally. On the other hand, when it comes
         # to file system interaction, byte strings are the more portable choice
@@ -504,24 +655,140 @@ def prepare_input():
         # which describes how surrogate encoding is used by Python 3 for
         # auto-correcting argument decoding issues (unknown byte sequences are
         # conserved and re-created upon encoding). Interesting in this regard:
-        # http://stackoverflow.com/a/846931/145400
-
-        # Definite choice for Python 2 and Unix: keep paths as byte strings.
         modtime = None
-        if options.time_from_basename:
+        if basename_fmt:
             bn = os.path.basename(path)
-            fmt = options.time_from_basename
-            log.debug("Parsing modification time from basename: %r", bn)
-            modtime = seconds_since_epoch_from_localtime_string(bn, fmt)
-            log.debug("Modification time (seconds since epoch): %s", modtime)
+            if debug:
+                log.debug("Parsing modification time from basename: %r", bn)
+            modtime = seconds_since_epoch_from_localtime_string(
+                bn, basename_fmt)
+            if debug:
+                log.debug(
+                    "Modification time (seconds since epoch): %s", modtime)
+        if options.jobs > 1:
+            # Create file system entries later, concurrently.
+            pathmodtimes.append((path, modtime, raw))
+            continue
         try:
-            fses.append(FileSystemEntry(path, modtime))
+            fse = FileSystemEntry(
+                path, modtime, statobj=statobjs.get(path), raw=raw)
         except OSError:
             err("Cannot access '%s'." % path)
+        statobjs[path] = fse.stat_result
+        fses.append(fse)
+    if pathmodtimes:
+        fses = create_fses_concurrently(pathmodtimes, options.jobs)
     log.debug("Created %s item(s) (type: file system entry).", len(fses))
     return fses
 
 
+def create_fses_concurrently(pathmodtimes, nthreads):
+    """Create `FileSystemEntry` objects from (path, modtime, raw) tuples.
+    Perform the lstat() system calls using a pool of `nthreads` threads, once
+    per unique path. Return list of objects in input order.
+
+    The lstat() system call releases the GIL, i.e. multiple calls can be in
+    flight at the same time. This pays off for file systems with a high access
+    latency (network file systems, cold caches, ...).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def lstat(path):
+        # Do not call err() from within a worker thread. Signal the error to
+        # the main thread instead.
+        try:
+            return os.lstat(path)
+        except OSError as e:
+            return e
+
+    paths = list(set(path for path, _, _ in pathmodtimes))
+    log.info("Retrieve file system entry information using %s threads.",
+        nthreads)
+    with ThreadPoolExecutor(min(nthreads, len(paths))) as executor:
+        statobjs = dict(zip(paths, executor.map(lstat, paths)))
+    fses = []
+    for path, modtime, raw in pathmodtimes:
+        statobj = statobjs[path]
+        if isinstance(statobj, OSError):
+            log.error("stat() failed on path: '%s' (%s).", path, statobj)
+            err("Cannot access '%s'." % path)
+        fses.append(FileSystemEntry(path, modtime, statobj=statobj, raw=raw))
+    return fses
+
+
+# Regular expressions for the strptime() directives supported by
+# `localtime_string_parser()`, in the order of the corresponding datetime
+# constructor arguments. These are the expressions used by the `_strptime`
+# module, so that both accept the same strings.
+STRPTIME_DIRECTIVES = (
+    ("Y", r"(\d\d\d\d)"),
+    ("m", r"(1[0-2]|0[1-9]|[1-9])"),
+    ("d", r"(3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])"),
+    ("H", r"(2[0-3]|[0-1]\d|\d)"),
+    ("M", r"([0-5]\d|\d)"),
+    ("S", r"(6[0-1]|[0-5]\d|\d)"),
+    )
+
+
+# Format string -> parser function (or None), see `localtime_string_parser()`.
+localtime_string_parsers = {}
+
+
+def localtime_string_parser(fmt):
+    """Return function that parses a string according to format string `fmt`
+    into a time struct, like `time.strptime()` does. Return None if `fmt`
+    contains directives other than %Y, %m, %d, %H, %M, %S, and %%.
+
+    `time.strptime()` is slow: for each call, it processes the format string
+    and the match result in pure Python. The returned function matches a
+    regular expression compiled once, and builds the time struct via
+    `datetime`. It returns None if the string does not match or does not
+    represent a valid date, so that the caller can fall back to
+    `time.strptime()` for the error message (or for edge cases, such as leap
+    seconds).
+    """
+    directives = dict(STRPTIME_DIRECTIVES)
+    fieldorder = [d for d, _ in STRPTIME_DIRECTIVES]
+    pattern = []
+    fields = []
+    # Literal text at even indices, directive characters at odd indices.
+    for i, part in enumerate(re.split(r"%(.)", fmt)):
+        if i % 2:
+            if part == "%":
+                pattern.append("%")
+                continue
+            if part not in directives or part in fields:
+                return None
+            fields.append(part)
+            pattern.append(directives[part])
+        elif "%" in part:
+            # Stray % at the end of the format string.
+            return None
+        else:
+            # Like strptime(), match any whitespace sequence in the format
+            # string against one or more whitespace characters.
+            pattern.append(r"\s+".join(
+                re.escape(l) for l in re.split(r"\s+", part)))
+    match = re.compile("".join(pattern) + r"\Z", re.IGNORECASE).match
+    indices = [fieldorder.index(f) for f in fields]
+
+    def parse(s):
+        m = match(s)
+        if m is None:
+            return None
+        # strptime() defaults.
+        values = [1900, 1, 1, 0, 0, 0]
+        for idx, v in zip(indices, m.groups()):
+            values[idx] = int(v)
+        try:
+            # The time tuple of a naive datetime object has tm_isdst set to -1,
+            # like the struct returned by strptime().
+            return datetime(*values).timetuple()
+        except ValueError:
+            return None
+    return parse
+
+
 def seconds_since_epoch_from_localtime_string(s, fmt):
     """Extract local time from string `s` according to format string `fmt`.
 
@@ -529,13 +796,17 @@ def seconds_since_epoch_from_localtime_string(s, fmt):
     time, compatible with e.g. stat result st_mtime.
     """
     try:
-        # Python 2.7's strptime can deal with `s` and `fmt` being byte string or
-        # unicode. Python 3's strptime requires both to be unicode type. Since
-        # argv is populated with unicode strings in Py 3, this requirement is
-        # always fulfilled.
-        time_struct_local = time.strptime(s, fmt)
-    except Exception as e:
-        err("Error while parsing time from item string. Error: %s" % e)
+        parse = localtime_string_parsers[fmt]
+    except KeyError:
+        parse = localtime_string_parsers[fmt] = localtime_string_parser(fmt)
+    time_struct_local = parse(s) if parse is not None else None
+    if time_struct_local is None:
+        try:
+            # strptime requires both, `s` and `fmt`, to be str. Since argv is
+            # populated with str objects, this requirement is always fulfilled.
+            time_struct_local = time.strptime(s, fmt)
+        except Exception as e:
+            err("Error while parsing time from item string. Error: %s" % e)
     try:
         seconds_since_epoch = time.mktime(time_struct_local)
     except Exception as e:
@@ -544,26 +815,31 @@ def seconds_since_epoch_from_localtime_string(s, fmt):
     return seconds_since_epoch
 
 
+# For membership tests only; TimeFilter relies on the order of its tuple.
+VALID_CATEGORIES = frozenset(TimeFilter.valid_categories)
+
+
 def parse_rules_from_cmdline(s):
     """Parse strings such as 'hours12,days5,weeks4' into rules dictionary.
     """
-    assert isinstance(s, text_type)
+    assert isinstance(s, str)
     tokens = s.split(",")
     rules = {}
     for t in tokens:
         log.debug("Analyze token <%s>", t)
         if not t:
             raise ValueError("Token is empty")
-        match = re.search(r'([a-z]+)([0-9]+)', t)
-        if match:
-            catid = match.group(1)
-            timecount = match.group(2)
-            if catid not in TimeFilter.valid_categories:
-                raise ValueError("Time category '%s' invalid" % catid)
-            rules[catid] = int(timecount)
-            log.debug("Stored rule: %s: %s", catid, timecount)
-            continue
-        raise ValueError("Invalid token <%s>" % t)
+        # A token consists of lowercase letters followed by digits, e.g.
+        # 'days12'. Strip the trailing digits (done in C) for finding the
+        # boundary.
+        catid = t.rstrip(digits)
+        timecount = t[len(catid):]
+        if not catid or not timecount or catid.strip(ascii_lowercase):
+            raise ValueError("Invalid token <%s>" % t)
+        if catid not in VALID_CATEGORIES:
+            raise ValueError("Time category '%s' invalid" % catid)
+        rules[catid] = int(timecount)
+        log.debug("Stored rule: %s: %s", catid, timecount)
     return rules
 
 
@@ -663,6 +939,13 @@ def parse_options():
         help="Perform wildcard expansion on items provided via command line.")
     parser.add_argument("-r", "--recursive-delete", action="store_true",
         help="Enable deletion of non-empty directories.")
+    parser.add_argument("-j", "--jobs", action="store", type=int, default=1,
+        metavar="N",
+        help=("Use N threads for retrieving file system entry information "
+            "(stat() system calls) and for performing the delete action. "
+            "May speed up processing of many items on high-latency "
+            "file systems. Default: 1.")
+        )
     #parser.add_argument("--follow-symlinks", action="store_true",
     #    help=("Retrieve modification time from symlink target, .. "
     #        "TODO: other implications? Not implemented yet.")
@@ -676,35 +959,5 @@ def parse_options():
     options = parser.parse_args()
 
 
-if WINDOWS and sys.version < '3':
-    def win32_unicode_argv():
-        """Use shell32.GetCommandLineArgvW to get sys.argv as a list of unicode
-        strings. Credits: http://stackoverflow.com/a/846931/145400
-
-        Python 2 does not support unicode in sys.argv on Windows, and replaces
-        multi-byte characters with '?'. This hack uses the recommended Windows
-        API for retrieving unicode code points. Not necessary for Python 3.
-        """
-        from ctypes import POINTER, byref, cdll, c_int, windll
-        from ctypes.wintypes import LPCWSTR, LPWSTR
-        GetCommandLineW = cdll.kernel32.GetCommandLineW
-        GetCommandLineW.argtypes = []
-        GetCommandLineW.restype = LPCWSTR
-        CommandLineToArgvW = windll.shell32.CommandLineToArgvW
-        CommandLineToArgvW.argtypes = [LPCWSTR, POINTER(c_int)]
-        CommandLineToArgvW.restype = POINTER(LPWSTR)
-        cmd = GetCommandLineW()
-        argc = c_int(0)
-        argv = CommandLineToArgvW(cmd, byref(argc))
-        if argc.value > 0:
-            # Remove Python executable and commands if present
-            start = argc.value - len(sys.argv)
-            return [argv[i] for i in
-                    xrange(start, argc.value)]
-
-    # Populate sys.argv with unicode objects.
-    sys.argv = win32_unicode_argv()
-
-
 if __name__ == "__main__":
     main()
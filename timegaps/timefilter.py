@@ -7,17 +7,33 @@ timegaps.timefilter -- generic time categorization logic as used by timegaps.
 """
 
 
-from __future__ import unicode_literals
 import time
+import heapq
+from bisect import bisect_right
 import logging
 from itertools import chain
 from collections import defaultdict
-from collections import OrderedDict
+from operator import attrgetter
 
 
 log = logging.getLogger("timefilter")
 
 
+# Length of one time unit in seconds, for all time categories except for
+# 'recent'. Time units are considered strictly linear (also see `_Timedelta`).
+_UNIT_SECONDS = {
+    "years": 31536000,  # 60 * 60 * 24 * 365
+    "months": 2592000,  # 60 * 60 * 24 * 30
+    "weeks": 604800,    # 60 * 60 * 24 * 7
+    "days": 86400,      # 60 * 60 * 24
+    "hours": 3600,      # 60 * 60
+    }
+
+
+# Sort key for items. Implemented in C, cheaper than an equivalent lambda.
+_MODTIME_KEY = attrgetter("modtime")
+
+
 class TimeFilterError(Exception):
     pass
 
@@ -30,10 +46,6 @@ class TimeFilter(object):
     valid_categories = ("years", "months", "weeks", "days", "hours", "recent")
 
     def __init__(self, rules, reftime=None):
-        # Define time categories (their labels) and their default filter
-        # values. Must be in order from past to future (old -> young).
-        time_categories = OrderedDict((c, 0) for c in self.valid_categories)
-
         # If the reference time is not provided by the user, use current time
         # (Unix timestamp, seconds since epoch, no localization -- this is
         # directly comparable to the st_mtime inode data).
@@ -47,7 +59,6 @@ class TimeFilter(object):
         if not len(userrules):
             raise TimeFilterError("Rules dictionary must not be emtpy.")
         greaterzerofound = False
-        # `items()` is Py2/3 portable, performance impact on Py2 negligible.
         for label, count in userrules.items():
             assert isinstance(count, int), "`rules` dict values must be int."
             if count > 0:
@@ -55,22 +66,58 @@ class TimeFilter(object):
             if count < 0:
                 raise TimeFilterError(
                     "'%s' count must be positive integer." % label)
-            if not label in time_categories:
+            if not label in self.valid_categories:
                 raise TimeFilterError(
                     "Invalid key in rules dictionary: '%s'" % label)
         if not greaterzerofound:
             raise TimeFilterError(
                 "Invalid rules dictionary: at least one count > 0 required.")
 
-        # Build up `self.rules` dict. Set rules not given by user to defaults,
-        # keep order of `time_categories` dict (order is crucial).
-        self.rules = OrderedDict()
-        # `items()` is Py2/3 portable, performance impact on Py2 negligible.
-        for label, defaultcount in time_categories.items():
-            if label in userrules:
-                self.rules[label] = userrules[label]
+        # Build up `self.rules` dict. Set rules not given by user to the
+        # default count 0. The filter logic does not depend on the order of
+        # this dictionary; category order is defined by `valid_categories`.
+        self.rules = dict(
+            (label, userrules.get(label, 0)) for label in self.valid_categories)
+        # Labels of all categories except for 'recent', from old to young.
+        self._categories = self.valid_categories[:-1]
+        # Precompute category boundaries: they only depend on the rules and
+        # are constant for all items to be categorized. For each category
+        # except for 'recent' (in order from young to old), store the length
+        # of one time unit and the (exclusive) upper age limit in seconds. An
+        # item of age A fits a category with timecount X = int(A / unit) and
+        # 0 < X <= count if unit <= A < (count + 1) * unit. Categories with
+        # count 0 cannot be fit by any item and are skipped.
+        self._boundaries = tuple(
+            (label, float(_UNIT_SECONDS[label]),
+                float(_UNIT_SECONDS[label] * (self.rules[label] + 1)))
+            for label in ("hours", "days", "weeks", "months", "years")
+            if self.rules[label] > 0)
+        # Items at least as old as `self._maxage` (in seconds) cannot fit any
+        # rule with a count > 0 and are rejected without further inspection.
+        # Recent items are never older than one hour.
+        self._maxage = max(
+            [3600.0] + [limit for _, _, limit in self._boundaries])
+        # Specialize the categorization for these rules: the category that an
+        # age (between one hour and `self._maxage`) fits only changes at the
+        # category boundaries. Split this age range into zones at all boundary
+        # values. All ages within a zone fit the same category (or none). For
+        # each zone, store its lower boundary and the category label and unit
+        # (label None: reject). Categorizing an item then requires a binary
+        # search (in C) instead of testing the categories one after another.
+        # All of this only depends on the rules, i.e. it is done once here and
+        # not upon each `filter()` call.
+        self._zonebreaks = sorted(set([3600.0] + [b
+            for _, unit, limit in self._boundaries for b in (unit, limit)
+            if 3600.0 <= b < self._maxage]))
+        zones = []
+        for b in self._zonebreaks:
+            for label, unit, limit in self._boundaries:
+                if unit <= b < limit:
+                    zones.append((label, unit))
+                    break
             else:
-                self.rules[label] = defaultcount
+                zones.append((None, None))
+        self._zones = tuple(zones)
         log.debug("TimeFilter set up with reftime %s and rules %s",
             self.reftime, self.rules)
 
@@ -102,59 +149,94 @@ class TimeFilter(object):
         # returns an iterable over rejected items via itertools'
         # `chain.from_iterable()`.
 
-        for catlabel in list(self.rules.keys())[:-1]:
-            setattr(self, "_%s_dict" % catlabel, defaultdict(list))
-        self._recent_items = []
+        # Category label -> bucket dictionary. Work with this local mapping,
+        # and expose each dictionary as `self._<category>_dict` attribute.
+        buckets = {}
+        for catlabel in self._categories:
+            buckets[catlabel] = defaultdict(list)
+            setattr(self, "_%s_dict" % catlabel, buckets[catlabel])
+        self._recent_items = recent_items = []
         accepted_objs = []
         rejected_objs_lists = [[]]
 
         # Categorize given objects.
         # Younger categories have higher priority than older ones. While
         # categorizing, already reject those objects that do not fit any rule.
+        # Compare each object's age against the precomputed category
+        # boundaries, which is equivalent to but cheaper than evaluating
+        # a `_Timedelta` for each object.
+        reftime = self.reftime
+        # Resolve each zone's category unit and bucket dictionary once instead
+        # of once per object: (unit, dictionary) tuple or None (reject).
+        zonebreaks = self._zonebreaks
+        zones = tuple((unit, buckets[label]) if label else None
+            for label, unit in self._zones)
+        maxage = self._maxage
+        # Bind the append methods of the containers used within the loop to
+        # local names. If no recent items are to be kept, reject them.
+        reject = rejected_objs_lists[0].append
+        if self.rules["recent"] > 0:
+            add_recent = recent_items.append
+        else:
+            add_recent = reject
         for obj in objs:
             # Might raise AttributeError if `obj` does not have `modtime`
-            # attribute or other exceptions upon `_Timedelta` creation.
-            try:
-                td = _Timedelta(obj.modtime, self.reftime)
-            except _TimedeltaError as e:
-                raise TimeFilterError("Cannot categorize %s: %s" % (obj, e))
+            # attribute or TypeError for non-numeric `modtime`.
+            age = reftime - obj.modtime
+            if age < 0:
+                raise TimeFilterError(("Cannot categorize %s: Modification "
+                    "time %s not earlier than reference time %s.") % (
+                    obj, obj.modtime, reftime))
+            if age >= maxage:
+                # `obj` is older than the oldest category-timecount bucket
+                # requested. Reject it right away (typical for archives where
+                # most items are old).
+                reject(obj)
+                continue
             # If timecount in youngest category after 'recent' is 0, then this
             # is a recent item.
-            if td.hours == 0:
-                if self.rules["recent"] > 0:
-                    self._recent_items.append(obj)
-                else:
-                    # This is a recent item, but we do not want to keep any.
-                    rejected_objs_lists[0].append(obj)
+            if age < 3600:
+                add_recent(obj)
                 continue
-            # Iterate through all categories from young to old, w/o 'recent'.
-            # Sign. performance impact, don't go with self.rules.keys()[-2::-1]
-            for catlabel in ("hours", "days", "weeks", "months", "years"):
-                timecount = getattr(td, catlabel)
-                if 0 < timecount <= self.rules[catlabel]:
-                    # `obj` is X hours/days/weeks/months/years old with X >= 1.
-                    # X is requested in current category, e.g. when 3 days are
-                    # requested (`self.rules[catlabel]` == 3), and category is
-                    # days and X is 2, then X <= 3, so put `obj` into
-                    # self._days_dict` with timecount (2) key.
-                    #log.debug("Put %s into %s/%s.", obj, catlabel, timecount)
-                    getattr(self, "_%s_dict" % catlabel)[timecount].append(obj)
-                    break
-            else:
-                # For loop did not break: `obj` is not recent and does not fit
-                # any of the rules provided. Reject it (the first item in
-                # `rejected_objs_lists` is a list for items rejected during
-                # categorization).
-                rejected_objs_lists[0].append(obj)
+            # Look up the zone `obj`'s age is in (`age` >= zonebreaks[0]).
+            zone = zones[bisect_right(zonebreaks, age) - 1]
+            if zone is None:
+                # `obj` is not recent and does not fit any of the rules
+                # provided. Reject it (the first item in `rejected_objs_lists`
+                # is a list for items rejected during categorization).
+                reject(obj)
                 #log.debug("Reject %s, does not fit any category.", obj)
+                continue
+            # `obj` is X hours/days/weeks/months/years old with X >= 1. X is
+            # requested in the zone's category, e.g. when 3 days are requested
+            # (`self.rules["days"]` == 3), and category is days and X is 2,
+            # then X <= 3, so put `obj` into self._days_dict` with timecount
+            # (2) key.
+            unit, catdict = zone
+            catdict[int(age / unit)].append(obj)
 
-        # Sort all category-timecount buckets internally and finish filtering:
-        # Accept the oldest element from each bucket, reject all others.
-        # The 'recent' items list needs special treatment. Sort, accept the
-        # oldest N elements, reject the others.
-        self._recent_items.sort(key=lambda f: f.modtime, reverse=True)
-        accepted_objs.extend(self._recent_items[-self.rules["recent"]:])
-        rejected_objs_lists.append(self._recent_items[:-self.rules["recent"]])
+        # Finish filtering: accept the oldest element from each
+        # category-timecount bucket, reject all others.
+        # The 'recent' items list needs special treatment: accept the oldest N
+        # elements (from newest to oldest), reject the others. Usually, N is
+        # much smaller than the number of recent items. Select the N oldest
+        # items via a heap instead of sorting all recent items. Iterate in
+        # reverse order, so that of multiple items with the same modification
+        # time the later ones are chosen (as a stable reverse sort would do).
+        nrecent = self.rules["recent"]
+        if len(recent_items) <= nrecent:
+            recent_items.sort(key=_MODTIME_KEY, reverse=True)
+            accepted_objs.extend(recent_items)
+        else:
+            oldest = heapq.nsmallest(
+                nrecent, reversed(recent_items), key=_MODTIME_KEY)
+            oldest.reverse()
+            accepted_objs.extend(oldest)
+            # Compare by identity: items are not required to be hashable, and
+            # different items may have the same modification time.
+            oldest_ids = set(map(id, oldest))
+            rejected_objs_lists.append(
+                [o for o in recent_items if id(o) not in oldest_ids])
         #log.debug("Accepted recent items (n=%s): %s", self.rules["recent"],
         #    self._recent_items[-self.rules["recent"]:])
         #log.debug("Rejected recent items: %s",
@@ -162,15 +244,23 @@ class TimeFilter(object):
         # Iterate through all other categories except for 'recent'.
         # `catdict[timecount]` occurrences are lists with at least one item.
         # The oldest item in each of these category-timecount buckets is to
-        # be accepted. Remove oldest from the list via pop() (should be of
-        # constant time complexity for the last item of a list). Then reject
-        # the (modified, if item has been popped) list.
-        for catlabel in list(self.rules.keys())[:-1]:
-            catdict = getattr(self, "_%s_dict" % catlabel)
+        # be accepted. Finding it does not require sorting the bucket (linear
+        # instead of linearithmic time). Of multiple items with the same
+        # (oldest) modification time, choose the last one. Remove it from the
+        # list via pop(), then reject the (modified) list. Most buckets contain
+        # a single item, take the shortcut for these.
+        for catlabel in self._categories:
+            catdict = buckets[catlabel]
             for timecount in catdict:
-                catdict[timecount].sort(key=lambda f: f.modtime, reverse=True)
-                accepted_objs.append(catdict[timecount].pop())
-                rejected_objs_lists.append(catdict[timecount])
+                bucket = catdict[timecount]
+                if len(bucket) == 1:
+                    accepted_objs.append(bucket.pop())
+                    continue
+                modtimes = list(map(_MODTIME_KEY, bucket))
+                modtimes.reverse()
+                idx = len(bucket) - 1 - modtimes.index(min(modtimes))
+                accepted_objs.append(bucket.pop(idx))
+                rejected_objs_lists.append(bucket)
                 #log.debug("Accept %s: oldest in %s/%s.",
                 #    accepted_objs[-1], catlabel, timecount)
                 #log.debug("Reject all newer items in %s/%s:\n%s",
@@ -191,7 +281,12 @@ class _Timedelta(object):
     There is no implicit summation, each of the numbers is to be considered
     independently. Time units are considered strictly linear: months are
     30 days, years are 365 days, weeks are 7 days, one day is 24 hours.
+
+    The exact (float) metrics are computed on access only, and instances do
+    not carry an attribute dictionary (see `__slots__`).
     """
+    __slots__ = ("seconds", "years", "months", "weeks", "days", "hours")
+
     def __init__(self, t, ref):
         # Expect two numeric values. Might raise TypeError for other types.
         seconds_earlier = ref - t
@@ -199,13 +294,29 @@ class _Timedelta(object):
         if seconds_earlier < 0:
             raise _TimedeltaError(("Modification time %s not "
                 "earlier than reference time %s.") % (t, ref))
-        self.hours_exact = seconds_earlier / 3600      # 60 * 60
-        self.hours = int(self.hours_exact)
-        self.days_exact = seconds_earlier / 86400      # 60 * 60 * 24
-        self.days = int(self.days_exact)
-        self.weeks_exact = seconds_earlier / 604800    # 60 * 60 * 24 * 7
-        self.weeks = int(self.weeks_exact)
-        self.months_exact = seconds_earlier / 2592000  # 60 * 60 * 24 * 30
-        self.months = int(self.months_exact)
-        self.years_exact = seconds_earlier / 31536000  # 60 * 60 * 24 * 365
-        self.years = int(self.years_exact)
+        self.seconds = seconds_earlier
+        self.hours = int(seconds_earlier / 3600)      # 60 * 60
+        self.days = int(seconds_earlier / 86400)      # 60 * 60 * 24
+        self.weeks = int(seconds_earlier / 604800)    # 60 * 60 * 24 * 7
+        self.months = int(seconds_earlier / 2592000)  # 60 * 60 * 24 * 30
+        self.years = int(seconds_earlier / 31536000)  # 60 * 60 * 24 * 365
+
+    @property
+    def hours_exact(self):
+        return self.seconds / 3600
+
+    @property
+    def days_exact(self):
+        return self.seconds / 86400
+
+    @property
+    def weeks_exact(self):
+        return self.seconds / 604800
+
+    @property
+    def months_exact(self):
+        return self.seconds / 2592000
+
+    @property
+    def years_exact(self):
+        return self.seconds / 31536000
@@ -12,16 +12,15 @@ import datetime
 import logging
 
 
-# Make the same code base run with Python 2 and 3.
-if sys.version < '3':
-    text_type = unicode
-    binary_type = str
-else:
-    text_type = str
-    binary_type = bytes
+log = logging.getLogger("timegaps")
 
 
-log = logging.getLogger("timegaps")
+# Map the file type bits of `st_mode` to the supported entry types.
+_TYPE_MAP = {
+    stat.S_IFREG: "file",
+    stat.S_IFDIR: "dir",
+    stat.S_IFLNK: "symlink",
+    }
 
 
 class TimegapsError(Exception):
@@ -35,13 +34,20 @@ class FilterItem(object):
 
     Public interface:
         self.text:    unicode object describing this item or None.
+        self.raw:     byte string this item was created from (e.g. as read
+                      from stdin) or None.
         self.moddate: last change as local datetime object.
         self.modtime: last change as float, seconds since Unix epoch (nonlocal).
     """
-    def __init__(self, modtime, text=None):
+    __slots__ = ("text", "raw", "modtime", "_moddate")
+
+    def __init__(self, modtime, text=None, raw=None):
         if text is not None:
-            assert isinstance(text, text_type)
+            assert isinstance(text, str)
         self.text = text
+        self.raw = raw
+        # (modtime, datetime) pair, filled upon first access of `moddate`.
+        self._moddate = None
         if isinstance(modtime, float):
             self.modtime = modtime
         else:
@@ -51,9 +57,16 @@ class FilterItem(object):
     @property
     def moddate(self):
         """Content modification time is internally stored as Unix timestamp.
-        Return datetime object corresponding to local time.
+        Return datetime object corresponding to local time. The conversion is
+        performed once and repeated only if `modtime` has changed since.
         """
-        return datetime.datetime.fromtimestamp(self.modtime)
+        # Subclasses might not call FilterItem.__init__(): tolerate the cache
+        # slot being unset.
+        cached = getattr(self, "_moddate", None)
+        if cached is None or cached[0] != self.modtime:
+            cached = self._moddate = (
+                self.modtime, datetime.datetime.fromtimestamp(self.modtime))
+        return cached[1]
 
     def __str__(self):
         return "%s(text: %s, moddate: %s)" % (self.__class__.__name__,
@@ -70,47 +83,54 @@ class FileSystemEntry(FilterItem):
     for later usage. Public interface (in addition to FilterItem's interface):
         self.type: "dir", "file", or "symlink".
         self.path: path to file system entry.
+        self.stat_result: lstat() result for the path.
+
+    If the caller already has the lstat() result for `path` (e.g. from
+    `os.scandir()`), it can be provided via `statobj`. Then, no additional
+    system call is performed.
     """
-    def __init__(self, path, modtime=None):
+    __slots__ = ("path", "type", "stat_result")
+
+    def __init__(self, path, modtime=None, statobj=None, raw=None):
         log.debug("Creating FileSystemEntry from path %r.", path)
-        try:
-            # os.lstat(path)
-            # Perform the equivalent of an lstat() system call on the given
-            # path. Similar to stat(), but does not follow symbolic links.
-            # On platforms that do not support symbolic links, this is an alias
-            # for stat().
-            self._stat = os.lstat(path)
-        except OSError as e:
-            log.error("stat() failed on path: '%s' (%s).", path, e)
-            raise
-        self.type = self._get_type(self._stat)
+        if statobj is not None:
+            self.stat_result = statobj
+        else:
+            try:
+                # os.lstat(path)
+                # Perform the equivalent of an lstat() system call on the given
+                # path. Similar to stat(), but does not follow symbolic links.
+                # On platforms that do not support symbolic links, this is an
+                # alias for stat().
+                self.stat_result = os.lstat(path)
+            except OSError as e:
+                log.error("stat() failed on path: '%s' (%s).", path, e)
+                raise
+        self.type = self._get_type(self.stat_result, path)
         log.debug("Detected type %s.", self.type)
         if modtime is None:
             # User may provide modification time -- if not, extract it from
             # inode. This is a Unix timestamp, seconds since epoch. Not
             # localized.
-            modtime = self._stat.st_mtime
+            modtime = self.stat_result.st_mtime
         else:
             log.debug("Don't use stat mtime, use %s.", modtime)
         self.path = path
         # FilterItem requires unicode `text` attribute, decode path if not
         # already unicode:
         t = path
-        if not isinstance(t, text_type):
+        if not isinstance(t, str):
             t = t.decode(sys.getfilesystemencoding())
-        FilterItem.__init__(self, text=t, modtime=modtime)
+        FilterItem.__init__(self, text=t, modtime=modtime, raw=raw)
 
-    def _get_type(self, statobj):
-        """Determine file type from stat object `statobj`.
-        Distinguish file, dir, symbolic link.
+    def _get_type(self, statobj, path):
+        """Determine file type from stat object `statobj` (retrieved for
+        `path`). Distinguish file, dir, symbolic link.
         """
-        if stat.S_ISREG(statobj.st_mode):
-            return "file"
-        if stat.S_ISDIR(statobj.st_mode):
-            return "dir"
-        if stat.S_ISLNK(statobj.st_mode):
-            return "symlink"
-        raise TimegapsError("Unsupported file type: '%s'", self.path)
+        t = _TYPE_MAP.get(stat.S_IFMT(statobj.st_mode))
+        if t is not None:
+            return t
+        raise TimegapsError("Unsupported file type: '%s'" % path)
 
     def __str__(self):
         return "%s(path: %r, moddate: %s)" % (self.__class__.__name__,
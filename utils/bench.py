@@ -54,7 +54,7 @@ def bench(funcname, samplesize, Ns):
         nbrs_fses_samples = []
         durations.append(dursamples)
         nbrs_fses.append(nbrs_fses_samples)
-        for _ in xrange(samplesize):
+        for _ in range(samplesize):
             nbr_fses, duration = globals()[funcname](N)
             dursamples.append(duration)
             nbrs_fses_samples.append(nbr_fses)
@@ -107,7 +107,7 @@ class FileSystemEntryMock(FileSystemEntry):
 
 
 def nrandint(n, min, max):
-    for _ in xrange(n):
+    for _ in range(n):
         yield randint(min, max)
 
 
@@ -7,9 +7,10 @@ import time
 from datetime import datetime
 from itertools import chain
 from random import randint, shuffle
-import cProfile, pstats, StringIO
+import cProfile, pstats, io
 
-from timegaps import FileSystemEntry, TimeFilter
+from timegaps.timegaps import FileSystemEntry
+from timegaps.timefilter import TimeFilter
 
 import logging
 logging.basicConfig(
@@ -41,10 +42,10 @@ def main():
     pr.enable()
     a, r = TimeFilter(rules, now).filter(fses)
     pr.disable()
-    s = StringIO.StringIO()
+    s = io.StringIO()
     ps = pstats.Stats(pr, stream=s).sort_stats('time')
     ps.print_stats(20)
-    print s.getvalue()
+    print(s.getvalue())
 
 
 class FileSystemEntryMock(FileSystemEntry):
@@ -59,7 +60,7 @@ class FileSystemEntryMock(FileSystemEntry):
 
 
 def nrandint(n, min, max):
-    for _ in xrange(n):
+    for _ in range(n):
         yield randint(min, max)
 
 